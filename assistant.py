@@ -1,19 +1,45 @@
 import argparse
 from dotenv import load_dotenv
 import os
-from pydantic import BaseModel, Field, ValidationError
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import Optional, List, Tuple
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
-from openai import OpenAI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI
+from openai.lib._pydantic import to_strict_json_schema
 import csv
-
-# Load environment variables from .env file
-load_dotenv()
+import operator
+import heapq
+import hashlib
+import functools
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional: fall back to the standard library json module
+    orjson = None
+
+try:
+    import tiktoken
+except ImportError:
+    # tiktoken is optional: fall back to a character-based token estimate
+    tiktoken = None
+
+try:
+    import diskcache
+except ImportError:
+    # diskcache is optional: without it every run scores all jobs
+    diskcache = None
 
 # Pydantic models supporting the project
 class JobSearchConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid", str_strip_whitespace=True)
+
     # Source: https://docs.brightdata.com/api-reference/web-scraper-api/social-media-apis/linkedin#discover-by-keyword
     location: str
     keyword: Optional[str] = None
@@ -24,13 +50,15 @@ class JobSearchConfig(BaseModel):
     remote: Optional[str] = None
     company: Optional[str] = None
     selective_search: Optional[bool] = Field(default=False)
-    jobs_to_not_include: Optional[List[str]] = Field(default_factory=list)
+    jobs_to_not_include: Optional[Tuple[str, ...]] = ()
     location_radius: Optional[str] = None
     # Additional fields
     profile_summary: str  # Candidate's profile summary for AI scoring
     desired_job_summary: str  # Description of the desired job for AI scoring
 
 class JobScore(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     job_posting_id: str
     score: int = Field(..., ge=0, le=100)
     comment: str
@@ -38,17 +66,62 @@ class JobScore(BaseModel):
 class JobScoresResponse(BaseModel):
     scores: List[JobScore]
 
+# OpenAI model used to score jobs
+_SCORING_MODEL = "gpt-5-mini"
+
+# Structured output format for scoring requests, built once instead of on every API call
+_SCORES_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "JobScoresResponse",
+        "schema": to_strict_json_schema(JobScoresResponse),
+        "strict": True,
+    }
+}
+
+def json_dumps(obj) -> str:
+    # Serialize to a JSON string, using orjson when available
+    if orjson:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+def json_loads(data):
+    # Parse JSON from str or bytes, using orjson when available
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def positive_int(value: str) -> int:
+    # argparse type for options that must be at least 1
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
 def parse_cli_args():
     # Parse command-line arguments for config and runtime options
     parser = argparse.ArgumentParser(description="LinkedIn Job Hunting Assistant")
     parser.add_argument("--config_file", type=str, default="config.json", help="Path to config JSON file")
     parser.add_argument("--jobs_number", type=int, default=20, help="Limit the number of jobs returned by Bright Data Scraper API")
-    parser.add_argument("--batch_size", type=int, default=5, help="Number of jobs to score in each batch")
-    parser.add_argument("--output_csv", type=str, default="jobs_scored.csv", help="Output CSV filename")
+    parser.add_argument("--max_batch_tokens", type=positive_int, default=6000, help="Token budget for the job postings sent in each scoring batch")
+    parser.add_argument("--batch_size", type=positive_int, default=None, help="Optional cap on the number of jobs to score in each batch")
+    parser.add_argument("--output", "--output_csv", dest="output", type=str, default=None, help="Output filename, defaults to jobs_scored.csv or jobs_scored.jsonl depending on --format (pass an empty string to skip the export)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Output file format")
+    parser.add_argument("--cache_dir", type=str, default=".cache/scores", help="Directory for cached job scores reused across runs (pass an empty string to disable)")
+    parser.add_argument("--min_score", type=int, default=0, help="Only keep jobs with an AI score of at least this value")
+    parser.add_argument("--percentile", type=float, default=0, help="Only keep jobs scoring at or above this percentile of all AI scores (e.g. 90 keeps roughly the top 10%%)")
+    parser.add_argument("--top", type=int, default=3, help="Number of top job matches to print")
+    parser.add_argument("--mode", choices=["sync", "batch"], default="sync", help="Score jobs with immediate Responses API calls (sync) or the cheaper, slower OpenAI Batch API (batch)")
+    parser.add_argument("--max_concurrency", type=positive_int, default=10, help="Maximum number of scoring requests in flight at once")
+    parser.add_argument("--tokens_per_minute", type=positive_int, default=200000, help="OpenAI tokens-per-minute budget shared by all scoring requests")
 
     return parser.parse_args()
 
 def load_env_vars():
+    # Load environment variables from .env file, unless the API keys are already set
+    if not (os.getenv("OPENAI_API_KEY") and os.getenv("BRIGHT_DATA_API_KEY")):
+        load_dotenv()
+
     # Read required API keys from environment and verify presence
     openai_api_key = os.getenv("OPENAI_API_KEY")
     brightdata_api_key = os.getenv("BRIGHT_DATA_API_KEY")
@@ -69,26 +142,32 @@ def load_env_vars():
 def load_and_validate_config(filename: str) -> JobSearchConfig:
     # Load JSON config file
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(filename, "rb") as f:
+            data = json_loads(f.read())
     except FileNotFoundError:
         raise FileNotFoundError(f"Config file '{filename}' not found.")
 
     try:
         # Deserialize the input JSON data to a JobSearchConfig instance
-        config = JobSearchConfig(**data)
+        config = JobSearchConfig.model_validate(data)
     except ValidationError as e:
         raise ValueError(f"Config deserialization error:\n{e}")
 
     return config
 
-def trigger_and_poll_linkedin_jobs(config: JobSearchConfig, brightdata_api_key: str, jobs_number: int, polling_timeout=10):
+# Reuse one HTTP session for Bright Data calls to keep connections alive across polls,
+# retrying transient failures with exponential backoff (POST is not retried to avoid duplicate triggers)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False),
+))
+
+def trigger_and_poll_linkedin_jobs(config: JobSearchConfig, brightdata_api_key: str, jobs_number: int, max_polling_delay=30):
     # Trigger the Bright Data LinkedIn job search
     url = "https://api.brightdata.com/datasets/v3/trigger"
-    headers = {
-        "Authorization": f"Bearer {brightdata_api_key}",
-        "Content-Type": "application/json",
-    }
+    _session.headers["Authorization"] = f"Bearer {brightdata_api_key}"
     params = {
         "dataset_id": "gd_lpfll7v5hcqtkxl6l", # Bright Data "Linkedin job listings information - discover by keyword" dataset ID
         "include_errors": "true",
@@ -112,7 +191,7 @@ def trigger_and_poll_linkedin_jobs(config: JobSearchConfig, brightdata_api_key:
         "location_radius": config.location_radius or "",
     }]
 
-    response = requests.post(url, headers=headers, params=params, json=data)
+    response = _session.post(url, params=params, json=data, timeout=(5, 30))
     if response.status_code != 200:
         raise RuntimeError(f"Trigger request failed: {response.status_code} - {response.text}")
 
@@ -124,89 +203,393 @@ def trigger_and_poll_linkedin_jobs(config: JobSearchConfig, brightdata_api_key:
 
     # Poll snapshot endpoint until data is ready or timeout
     snapshot_url = f"https://api.brightdata.com/datasets/v3/snapshot/{snapshot_id}?format=json"
-    headers = {"Authorization": f"Bearer {brightdata_api_key}"}
 
     print(f"Polling snapshot for ID: {snapshot_id}")
 
+    # Start polling quickly and back off exponentially up to max_polling_delay
+    delay = 1.0
     while True:
-        snap_resp = requests.get(snapshot_url, headers=headers)
+        snap_resp = _session.get(snapshot_url, timeout=(5, 30))
         if snap_resp.status_code == 200:
             # Snapshot ready: return job postings JSON data
             print("Snapshot is ready")
 
             return snap_resp.json()
         elif snap_resp.status_code == 202:
-            # Snapshot not ready yet: wait and retry
-            print(f"Snapshot not ready yet. Retrying in {polling_timeout} seconds...")
-            time.sleep(polling_timeout)
+            # Snapshot not ready yet: wait and retry, honoring Retry-After when Bright Data sends one
+            retry_after = snap_resp.headers.get("Retry-After", "")
+            wait = int(retry_after) if retry_after.isdigit() else delay
+            print(f"Snapshot not ready yet. Retrying in {wait:g} seconds...")
+            time.sleep(wait)
+            delay = min(delay * 1.5, max_polling_delay)
         else:
             raise RuntimeError(f"Snapshot polling failed: {snap_resp.status_code} - {snap_resp.text}")
 
-# Initialize OpenAI client
-client = OpenAI()
-
-def score_jobs_batch(jobs_batch: List[dict], profile_summary: str, desired_job_summary: str) -> List[JobScore]:
-    # Construct prompt for AI to score job matches based on candidate profile
-    prompt = f"""
-        "You are an expert recruiter. Given the following candidate profile:\n"
-        "{profile_summary}\n\n"
-        "Desired job description:\n{desired_job_summary}\n\n"
-        "Score each job posting accurately from 0 to 100 on how well it matches the profile and desired job.\n"
-        "For each job, add a short comment (max 50 words) explaining the score and match quality.\n"
-        "Return an array of objects with keys 'job_posting_id', 'score', and 'comment'.\n\n"
-        "Jobs:\n{json.dumps(jobs_batch)}\n"
-    """
-    messages = [
-        {"role": "system", "content": "You are a helpful job scoring assistant."},
-        {"role": "user", "content": prompt},
+class TokenBucketRateLimiter:
+    # Token bucket refilled continuously up to the tokens-per-minute budget
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.last_refill = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        # A single request larger than the whole budget can only wait for a full bucket
+        tokens = min(tokens, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.last_refill) * self.capacity / 60)
+                self.last_refill = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                await asyncio.sleep((tokens - self.available) * 60 / self.capacity)
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic: ~4 characters per token for English text and JSON
+    return len(text) // 4 + 1
+
+# Bright Data job fields relevant to scoring (URLs, logos, apply links, etc. only cost prompt tokens)
+_SCORING_FIELDS = (
+    "job_posting_id",
+    "job_title",
+    "job_summary",
+    "company_name",
+    "job_location",
+    "job_seniority_level",
+    "job_employment_type",
+    "job_function",
+    "job_industries",
+)
+_MAX_JOB_SUMMARY_CHARS = 1200
+
+def trim_job_for_scoring(job: dict) -> dict:
+    # Keep only scoring-relevant fields and cap the length of the job summary
+    trimmed = {field: job.get(field) for field in _SCORING_FIELDS}
+    if trimmed["job_summary"]:
+        trimmed["job_summary"] = trimmed["job_summary"][:_MAX_JOB_SUMMARY_CHARS]
+    return trimmed
+
+def parse_job_scores(output_text: str) -> List[JobScore]:
+    # The output was generated against the strict JobScoresResponse schema,
+    # so build the models without running validation a second time
+    return [JobScore.model_construct(**score) for score in json_loads(output_text)["scores"]]
+
+# Static scoring instructions. They open the system message so every scoring request shares
+# the same long prefix, which lets OpenAI prompt caching (prefixes of 1024+ tokens) reuse it
+_SCORING_INSTRUCTIONS = """You are an expert recruiter and a helpful job scoring assistant.
+You will receive a candidate profile, a description of the job the candidate wants, and then a JSON array of LinkedIn job postings.
+Score each job posting accurately from 0 to 100 on how well it matches the profile and desired job.
+
+How to evaluate a job posting:
+1. Role fit: compare the job title, job function and job summary with the desired job description. The core responsibilities matter more than the exact title wording; the same role is often advertised under different titles.
+2. Experience fit: compare the seniority level and the years of experience the posting asks for with the candidate profile. Penalize postings that are clearly too junior or too senior for the candidate.
+3. Skills fit: check whether the skills, tools, methodologies and domain knowledge the posting emphasizes appear in the candidate profile. Transferable skills count, but less than direct experience.
+4. Domain fit: consider the industry, product type and company described in the posting against any industry or product preferences in the desired job description.
+5. Practical fit: consider employment type and location against the desired job description. Only penalize these when the desired job description states a clear preference.
+6. Missing information: when a posting leaves out information, do not assume it is a mismatch. Score based on what is present and mention important gaps in the comment.
+
+Scoring bands:
+- 90-100: Excellent match. The role, seniority, skills and domain all line up with the profile and the desired job, with no significant concerns.
+- 75-89: Strong match. The role and seniority fit well, with minor gaps in skills, domain or practical preferences.
+- 60-74: Reasonable match. The role is related and the candidate could be competitive, but there are noticeable gaps or the role only partly matches the desired job.
+- 40-59: Weak match. Some overlap exists, but the role, seniority or domain differs substantially from what the candidate wants or offers.
+- 20-39: Poor match. Little overlap beyond generic skills; the candidate would be unlikely to want or be considered for the role.
+- 0-19: No match. The posting is for an unrelated role or field, or it is not a genuine job posting.
+
+Scoring rules:
+- Score every posting independently against the candidate; do not grade on a curve within the list.
+- Use the full range of scores and be consistent: two postings of similar quality should receive similar scores.
+- Do not reward postings for being long, for prestigious company names, or for buzzwords that are not backed by the described responsibilities.
+- Do not let salary, company size or brand affect the score unless the desired job description mentions them.
+- If a posting is a duplicate or near-duplicate of another one in the list, score both the same way.
+
+Weighing the criteria:
+- Role fit and experience fit matter most. A posting that fails either of them should rarely score above 59, however well the other criteria match.
+- Skills fit separates strong matches from reasonable ones. Use it to move a score within a band rather than across several bands.
+- Domain fit and practical fit adjust the score by a few points unless the desired job description makes them a hard requirement. If it does, a clear conflict should cap the score at 39.
+
+Reading job postings:
+- Job titles are inconsistent across companies. Titles such as "Lead", "Principal", "Staff", "Head of" or "Associate" mean different things at different companies, so infer the real seniority from the responsibilities, the scope of ownership and the experience requirements.
+- Treat lists of "nice to have" or "preferred" qualifications as less important than required qualifications. Missing a preferred qualification is a minor gap; missing a required one is a significant gap.
+- Recruiting agency and staffing postings often describe the client company vaguely. Score them on the described role, and mention in the comment when the employer is unclear.
+- Contract, temporary, part-time and internship postings should be penalized only when the desired job description asks for a different employment type.
+- Remote, hybrid and on-site arrangements, relocation and travel requirements should be penalized only when they conflict with a preference stated in the desired job description or the candidate profile.
+- Postings that mainly advertise training programs, unpaid work, commission-only sales or recruiting for multiple unspecified roles should score in the lowest bands unless the candidate asks for them.
+
+Examples of good comments:
+- "Strong fit: B2B SaaS product ownership and agile team leadership match the profile. Gap: the role asks for payments domain experience the candidate has not mentioned."
+- "Seniority mismatch: this is an entry-level coordinator role with little product ownership, well below the candidate's seven years of experience."
+- "Related but different: the role is project management for hardware launches rather than software product management, so only the leadership skills transfer."
+
+Comments:
+- For each job, add a short comment (max 50 words) explaining the score and match quality.
+- Mention the strongest reason for the match and the most important gap or concern, if there is one.
+- Write comments in plain language for the candidate; do not repeat the score or the job title.
+
+Output:
+- Return an array of objects with keys 'job_posting_id', 'score', and 'comment'.
+- Include exactly one object for every job posting you receive, using its job_posting_id exactly as given.
+- Do not invent job postings and do not skip any."""
+
+def build_system_prompt(profile_summary: str, desired_job_summary: str) -> str:
+    # Static instructions followed by the candidate details, identical for every batch in a run
+    return (
+        f"{_SCORING_INSTRUCTIONS}\n\n"
+        f"Candidate profile:\n{profile_summary}\n\n"
+        f"Desired job description:\n{desired_job_summary}"
+    )
+
+def build_scoring_messages(system_prompt: str, jobs_batch: List[dict]) -> List[dict]:
+    # Only the job postings change between batches, so they go last in their own user message
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Jobs:\n{json_dumps([trim_job_for_scoring(job) for job in jobs_batch])}"},
     ]
 
-    # Use OpenAI API to parse structured response into JobScoresResponse model
-    response = client.responses.parse(
-        model="gpt-5-mini",
-        input=messages,
-        text_format=JobScoresResponse,
-    )
+async def score_jobs_batch(aclient: AsyncOpenAI, system_prompt: str, jobs_batch: List[dict],
+                           semaphore: asyncio.Semaphore, rate_limiter: TokenBucketRateLimiter) -> List[JobScore]:
+    messages = build_scoring_messages(system_prompt, jobs_batch)
+
+    # Limit in-flight requests and wait for enough token budget before calling the API
+    async with semaphore:
+        await rate_limiter.acquire(sum(estimate_tokens(message["content"]) for message in messages))
+
+        # Use OpenAI API to get a structured response matching the JobScoresResponse schema
+        response = await aclient.responses.create(
+            model=_SCORING_MODEL,
+            input=messages,
+            text=_SCORES_TEXT_FORMAT,
+        )
 
     # Return list of scored jobs
-    return response.output_parsed.scores
+    return parse_job_scores(response.output_text)
+
+@functools.lru_cache(maxsize=None)
+def get_token_encoding():
+    # Load the tokenizer once per process; tiktoken downloads its BPE ranks on first use
+    if not tiktoken:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"[Warning] Could not load tiktoken encoding, estimating token counts instead: {e}")
+        return None
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    # encode_batch tokenizes all texts in parallel in tiktoken's Rust core
+    encoding = get_token_encoding()
+    if encoding is None:
+        return [estimate_tokens(text) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(texts, num_threads=os.cpu_count() or 1)]
+
+def iter_job_batches(jobs_data: List[dict], max_batch_tokens: int, max_batch_size: Optional[int] = None):
+    # Greedily pack jobs into batches whose trimmed JSON payload fits within max_batch_tokens,
+    # so short postings share a request instead of each fixed-size batch paying request overhead
+    token_counts = count_tokens_batch([json_dumps(trim_job_for_scoring(job)) for job in jobs_data])
+
+    batch, batch_tokens = [], 0
+    for job, job_tokens in zip(jobs_data, token_counts):
+        if batch and (batch_tokens + job_tokens > max_batch_tokens or len(batch) == max_batch_size):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(job)
+        batch_tokens += job_tokens
+
+    if batch:
+        yield batch
+
+async def score_jobs(aclient: AsyncOpenAI, batches: List[List[dict]], config: JobSearchConfig,
+                     max_concurrency: int, tokens_per_minute: int) -> List[JobScore]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rate_limiter = TokenBucketRateLimiter(tokens_per_minute)
+    system_prompt = build_system_prompt(config.profile_summary, config.desired_job_summary)
+
+    # Score the batches concurrently
+    print(f"Scoring {len(batches)} batches (up to {max_concurrency} at a time)...")
+
+    tasks = [
+        score_jobs_batch(aclient, system_prompt, batch, semaphore, rate_limiter)
+        for batch in batches
+    ]
+    # Keep the batches that succeeded even if others fail, and report the failures
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, BaseException)]
+    for error in failures:
+        print(f"[Warning] Scoring batch failed: {error}")
+    if failures and len(failures) == len(results):
+        raise RuntimeError(f"All {len(results)} scoring batches failed") from failures[0]
+
+    return [score for scores in results if not isinstance(scores, BaseException) for score in scores]
+
+def iter_batch_results(client: OpenAI, file_id: str):
+    # Download a Batch API output or error file and parse its JSONL lines
+    for line in client.files.content(file_id).text.splitlines():
+        if line.strip():
+            yield json_loads(line)
+
+def describe_batch_error(result: dict) -> str:
+    # Errors come either as a top-level error object or as a non-200 response body
+    response = result.get("response") or {}
+    return str(result.get("error") or response.get("body"))
+
+def score_jobs_with_batch_api(client: OpenAI, batches: List[List[dict]], config: JobSearchConfig, polling_timeout=60) -> List[JobScore]:
+    # Serialize one Responses API request per batch into the Batch API JSONL input format
+    system_prompt = build_system_prompt(config.profile_summary, config.desired_job_summary)
+    lines = []
+    for i, batch in enumerate(batches, start=1):
+        lines.append(json_dumps({
+            "custom_id": f"batch-{i}",
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": {
+                "model": _SCORING_MODEL,
+                "input": build_scoring_messages(system_prompt, batch),
+                "text": _SCORES_TEXT_FORMAT,
+            },
+        }))
+
+    # Upload the requests and submit them as a single OpenAI batch
+    input_file = client.files.create(file=("jobs_scoring.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch_job = client.batches.create(input_file_id=input_file.id, endpoint="/v1/responses", completion_window="24h")
+
+    print(f"OpenAI batch submitted with {len(lines)} requests! Batch ID: {batch_job.id}")
+
+    # Poll the batch until it reaches a terminal status
+    while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+        print(f"Batch status: {batch_job.status}. Retrying in {polling_timeout} seconds...")
+        time.sleep(polling_timeout)
+        batch_job = client.batches.retrieve(batch_job.id)
+
+    # Expired or cancelled batches still write the requests that finished to the output file
+    if batch_job.status == "failed":
+        raise RuntimeError(f"OpenAI batch {batch_job.id} failed: {batch_job.errors}")
+    if batch_job.status != "completed":
+        print(f"[Warning] OpenAI batch {batch_job.id} ended as {batch_job.status}; keeping the requests that finished")
+
+    # Failed requests are written to a separate error file, so their jobs are missing from the output
+    failed = batch_job.request_counts.failed if batch_job.request_counts else 0
+    if failed:
+        print(f"[Warning] {failed} of {batch_job.request_counts.total} batch requests failed; their jobs will not be scored")
+    if batch_job.error_file_id:
+        for result in iter_batch_results(client, batch_job.error_file_id):
+            print(f"[Warning] Request {result.get('custom_id')} failed: {describe_batch_error(result)}")
+
+    if not batch_job.output_file_id:
+        raise RuntimeError(f"OpenAI batch {batch_job.id} ({batch_job.status}) produced no results for its {len(lines)} requests")
+
+    # Download the output file and parse each response back into JobScoresResponse
+    all_scores = []
+    for result in iter_batch_results(client, batch_job.output_file_id):
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            print(f"[Warning] Request {result.get('custom_id')} failed: {describe_batch_error(result)}")
+            continue
+
+        # Responses cut short (e.g. by the output token limit) carry truncated JSON
+        body = response.get("body") or {}
+        if body.get("status") != "completed":
+            print(f"[Warning] Request {result.get('custom_id')} did not complete: {body.get('status')} {body.get('incomplete_details') or ''}")
+            continue
+
+        for item in body["output"]:
+            if item["type"] != "message":
+                continue
+            for content in item["content"]:
+                if content["type"] != "output_text":
+                    continue
+                try:
+                    all_scores.extend(parse_job_scores(content["text"]))
+                except (ValueError, KeyError) as e:
+                    print(f"[Warning] Request {result.get('custom_id')} returned unparseable scores: {e}")
+
+    return all_scores
+
+def deduplicate_jobs(jobs: List[dict]) -> List[dict]:
+    # Keep the first posting for each job ID, preserving the original order
+    unique_jobs = {}
+    for job in jobs:
+        unique_jobs.setdefault(job.get("job_posting_id"), job)
+    return list(unique_jobs.values())
+
+def score_cache_key(job: dict, system_prompt: str) -> str:
+    # A score stays valid while the model and everything sent to it (instructions, candidate details
+    # and the trimmed job posting) are unchanged
+    key = "\0".join([_SCORING_MODEL, system_prompt, json_dumps(trim_job_for_scoring(job))])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def split_cached_jobs(jobs: List[dict], system_prompt: str, score_cache) -> Tuple[List[JobScore], List[dict]]:
+    # Separate jobs already scored by a previous run from the ones that still need scoring
+    cached_scores, uncached_jobs = [], []
+    for job in jobs:
+        cached = score_cache.get(score_cache_key(job, system_prompt))
+        if cached is None:
+            uncached_jobs.append(job)
+        else:
+            score, comment = cached
+            cached_scores.append(JobScore.model_construct(job_posting_id=job.get("job_posting_id"), score=score, comment=comment))
+    return cached_scores, uncached_jobs
+
+def store_cached_scores(jobs: List[dict], scores: List[JobScore], system_prompt: str, score_cache):
+    # Save new scores so later runs can skip the API call for these jobs
+    scores_by_id = {score_obj.job_posting_id: score_obj for score_obj in scores}
+    for job in jobs:
+        score_obj = scores_by_id.get(job.get("job_posting_id"))
+        if score_obj:
+            score_cache.set(score_cache_key(job, system_prompt), (score_obj.score, score_obj.comment))
 
 def extend_jobs_with_scores(jobs: List[dict], all_scores: List[JobScore]) -> List[dict]:
     # Where to store the enriched data
     extended_jobs = []
 
-    # Combine original jobs with AI scores and comments
-    for score_obj in all_scores:
-        matched_job = None
-        for job in jobs:
-            if job.get("job_posting_id") == score_obj.job_posting_id:
-                matched_job = job
-                break
-        if matched_job:
-            job_with_score = dict(matched_job)
-            job_with_score["ai_score"] = score_obj.score
-            job_with_score["ai_comment"] = score_obj.comment
-            extended_jobs.append(job_with_score)
-
-    # Sort extended jobs by AI score (highest first)
-    extended_jobs.sort(key=lambda j: j["ai_score"], reverse=True)
-    return extended_jobs
+    # Index scores by job ID once so each job is matched with a single lookup
+    scores_by_id = {score_obj.job_posting_id: score_obj for score_obj in all_scores}
 
-def export_extended_jobs(extended_jobs: List[dict], output_csv: str):
-    # Dynamically get the field names from the first element in the array
-    fieldnames = list(extended_jobs[0].keys())
-    with open(output_csv, mode="w", newline="", encoding="utf-8") as csvfile:
-         # Write extended job data with AI scores to CSV
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for job in extended_jobs:
-            writer.writerow(job)
+    # Combine original jobs with AI scores and comments (duplicate postings share one score)
+    for job in jobs:
+        score_obj = scores_by_id.get(job.get("job_posting_id"))
+        if score_obj:
+            extended_jobs.append({**job, "ai_score": score_obj.score, "ai_comment": score_obj.comment})
 
-    print(f"Exported {len(extended_jobs)} jobs to {output_csv}")
+    return extended_jobs
+
+def filter_jobs_by_score(extended_jobs: List[dict], min_score: int = 0, percentile: float = 0) -> List[dict]:
+    # Combine the absolute and percentile-based thresholds into a single score cutoff
+    threshold = min_score
+    if percentile > 0 and extended_jobs:
+        scores = sorted(job["ai_score"] for job in extended_jobs)
+        threshold = max(threshold, scores[min(len(scores) - 1, int(len(scores) * percentile / 100))])
+
+    return [job for job in extended_jobs if job["ai_score"] >= threshold]
+
+def export_extended_jobs(extended_jobs: List[dict], output_file: str, output_format: str = "csv"):
+    if output_format == "jsonl":
+        # Write one JSON object per line, serialized straight to bytes when orjson is available
+        with open(output_file, mode="wb") as jsonlfile:
+            if orjson:
+                jsonlfile.writelines(orjson.dumps(job) + b"\n" for job in extended_jobs)
+            else:
+                jsonlfile.writelines(json.dumps(job).encode("utf-8") + b"\n" for job in extended_jobs)
+    else:
+        # Dynamically get the union of job field names across all jobs, in first-seen order,
+        # since Bright Data omits sparse fields from some records; AI columns always come last
+        ai_fields = ["ai_score", "ai_comment"]
+        fieldnames = list(dict.fromkeys(key for job in extended_jobs for key in job if key not in ai_fields)) + ai_fields
+        # Pre-extract rows as lists so the C-implemented csv.writer avoids DictWriter's per-row lookups
+        rows = [[job.get(key, "") for key in fieldnames] for job in extended_jobs]
+        with open(output_file, mode="w", newline="", encoding="utf-8") as csvfile:
+             # Write extended job data with AI scores to CSV
+            writer = csv.writer(csvfile)
+            writer.writerow(fieldnames)
+            writer.writerows(rows)
+
+    print(f"Exported {len(extended_jobs)} jobs to {output_file}")
 
 def print_top_jobs(extended_jobs: List[dict], top: int = 3):
     print(f"\n*** Top {top} job matches ***")
-    for job in extended_jobs[:3]:
+    # Select the best matches without sorting the whole list
+    for job in heapq.nlargest(top, extended_jobs, key=operator.itemgetter("ai_score")):
         print(f"URL: {job.get('url', 'N/A')}")
         print(f"Title: {job.get('job_title', 'N/A')}")
         print(f"AI Score: {job.get('ai_score')}")
@@ -224,34 +607,68 @@ def main():
          # Load job search config file
         config = load_and_validate_config(args.config_file)
 
-        # Fetch jobs
-        jobs_data = trigger_and_poll_linkedin_jobs(config, brightdata_api_key, args.jobs_number)
+        # Initialize the OpenAI client for the selected mode in the background while jobs are fetched;
+        # polling stays on the main thread so Ctrl+C interrupts it immediately
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            fut_client = pool.submit(OpenAI if args.mode == "batch" else AsyncOpenAI)
+            jobs_data = trigger_and_poll_linkedin_jobs(config, brightdata_api_key, args.jobs_number)
+            openai_client = fut_client.result()
 
         print(f"{len(jobs_data)} jobs found!")
     except Exception as e:
         print(f"[Error] {e}")
         return
 
-    all_scores = []
-    # Process jobs in batches to avoid overloading API and to handle large datasets
-    for i in range(0, len(jobs_data), args.batch_size):
-        batch = jobs_data[i : i + args.batch_size]
+    # Score each unique job only once, even if Bright Data returned it several times
+    unique_jobs = deduplicate_jobs(jobs_data)
+    if len(unique_jobs) < len(jobs_data):
+        print(f"Skipping {len(jobs_data) - len(unique_jobs)} duplicate jobs")
 
-        print(f"Scoring batch {i // args.batch_size + 1} with {len(batch)} jobs...")
+    # Reuse scores cached by previous runs so only new or changed jobs are sent to OpenAI
+    score_cache = diskcache.Cache(args.cache_dir) if diskcache and args.cache_dir else None
+    system_prompt = build_system_prompt(config.profile_summary, config.desired_job_summary)
+    cached_scores, jobs_to_score = [], unique_jobs
+    new_scores = []
+    try:
+        if score_cache is not None:
+            cached_scores, jobs_to_score = split_cached_jobs(unique_jobs, system_prompt, score_cache)
+            print(f"{len(cached_scores)} jobs already scored in a previous run")
 
-        scores = score_jobs_batch(batch, config.profile_summary, config.desired_job_summary)
-        all_scores.extend(scores)
+        if jobs_to_score:
+            # Process jobs in token-budgeted batches to keep each prompt within a predictable size
+            batches = list(iter_job_batches(jobs_to_score, args.max_batch_tokens, args.batch_size))
+            print(f"Split {len(jobs_to_score)} jobs into {len(batches)} batches")
 
-        time.sleep(1) # To avoid triggering API rate limits
+            # Score the remaining jobs with the OpenAI API
+            if args.mode == "batch":
+                new_scores = score_jobs_with_batch_api(openai_client, batches, config)
+            else:
+                new_scores = asyncio.run(score_jobs(openai_client, batches, config, args.max_concurrency, args.tokens_per_minute))
+
+            if score_cache is not None:
+                store_cached_scores(jobs_to_score, new_scores, system_prompt, score_cache)
+    finally:
+        if score_cache is not None:
+            score_cache.close()
+
+    all_scores = cached_scores + new_scores
 
     # Merge scores into scraped jobs
     extended_jobs = extend_jobs_with_scores(jobs_data, all_scores)
 
-    # Save results to CSV
-    export_extended_jobs(extended_jobs, args.output_csv)
+    # Drop jobs below the requested score thresholds
+    if args.min_score or args.percentile:
+        extended_jobs = filter_jobs_by_score(extended_jobs, args.min_score, args.percentile)
+        print(f"{len(extended_jobs)} jobs left after score filtering")
+
+    # Save results to CSV or JSONL, sorted by AI score (highest first)
+    output_file = args.output if args.output is not None else f"jobs_scored.{args.format}"
+    if output_file:
+        extended_jobs.sort(key=operator.itemgetter("ai_score"), reverse=True)
+        export_extended_jobs(extended_jobs, output_file, args.format)
 
     # Print top job matches with key info for quick review
-    print_top_jobs(extended_jobs)
+    print_top_jobs(extended_jobs, args.top)
 
 if __name__ == "__main__":
     main()